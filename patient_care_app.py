@@ -2,17 +2,21 @@ import tkinter as tk
 from tkinter import ttk, messagebox, filedialog
 from tkcalendar import DateEntry
 import sqlite3
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import re
 from reportlab.lib.pagesizes import letter
 from reportlab.pdfgen import canvas
-import traceback
+import logging
 import sys
 import os
 import platform
 import shutil
 import json
-from zipfile import ZipFile
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from zipfile import ZipFile, ZIP_DEFLATED
+
+log = logging.getLogger(__name__)
 
 # --- Database Setup ---
 def get_db_path():
@@ -33,39 +37,63 @@ def get_db_path():
     
     return os.path.join(db_dir, 'patientcare.db')
 
+def connect_database(db_path):
+    """Open the database and apply the connection settings used throughout the app"""
+    # Transactions are opened explicitly with BEGIN where several writes must go together
+    # Room for every statement the app runs, so none is re-prepared after eviction
+    conn = sqlite3.connect(db_path, isolation_level=None, cached_statements=256)
+    cursor = conn.cursor()
+
+    # Enable foreign key constraints
+    cursor.execute("PRAGMA foreign_keys = ON")
+
+    # WAL is persistent per database file, the rest must be set on every connection
+    cursor.execute("PRAGMA journal_mode = WAL")
+    cursor.execute("PRAGMA synchronous = NORMAL")
+    cursor.execute("PRAGMA temp_store = MEMORY")
+    cursor.execute("PRAGMA cache_size = -20000")  # ~20 MiB page cache
+    cursor.execute("PRAGMA mmap_size = 268435456")
+    cursor.execute("PRAGMA cache_spill = OFF")
+    return conn, cursor
+
+def create_schema(cursor):
+    """Create any missing tables and indexes; safe to run on an existing database"""
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS Patients (
+        PatientID INTEGER PRIMARY KEY AUTOINCREMENT,
+        Name TEXT NOT NULL,
+        Age INTEGER,
+        Gender TEXT,
+        Address TEXT,
+        MobileNumber TEXT,
+        EntryDate TEXT DEFAULT CURRENT_TIMESTAMP
+    )
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS Medicines (
+        MedicineID INTEGER PRIMARY KEY AUTOINCREMENT,
+        PatientID INTEGER,
+        MedicineName TEXT,
+        StartDate TEXT,
+        Quantity INTEGER,
+        Frequency TEXT,
+        EndDate TEXT,
+        FOREIGN KEY(PatientID) REFERENCES Patients(PatientID) ON DELETE CASCADE
+    )
+    """)
+
+    # Used by the patient/medicine join and by per-patient lookups and cascades
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_med_patient ON Medicines(PatientID)")
+
+    # Leftover copy from the old resequencing routine, which could outlive a failed run
+    cursor.execute("DROP TABLE IF EXISTS Patients_temp")
+
 def setup_database():
     try:
         db_path = get_db_path()
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
-        # Enable foreign key constraints
-        cursor.execute("PRAGMA foreign_keys = ON")
-        
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS Patients (
-            PatientID INTEGER PRIMARY KEY AUTOINCREMENT,
-            Name TEXT NOT NULL,
-            Age INTEGER,
-            Gender TEXT,
-            Address TEXT,
-            MobileNumber TEXT,
-            EntryDate TEXT DEFAULT CURRENT_TIMESTAMP
-        )
-        """)
-
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS Medicines (
-            MedicineID INTEGER PRIMARY KEY AUTOINCREMENT,
-            PatientID INTEGER,
-            MedicineName TEXT,
-            StartDate TEXT,
-            Quantity INTEGER,
-            Frequency TEXT,
-            EndDate TEXT,
-            FOREIGN KEY(PatientID) REFERENCES Patients(PatientID) ON DELETE CASCADE
-        )
-        """)
+        conn, cursor = connect_database(db_path)
+        create_schema(cursor)
         conn.commit()
         return conn, cursor
     except sqlite3.Error as e:
@@ -80,6 +108,8 @@ except Exception as e:
     sys.exit(1)
 
 # --- Backup/Restore Functions ---
+_COPY_BUFFER_SIZE = 1024 * 1024  # 1 MiB chunks when zipping the database snapshot
+
 def backup_data():
     """Create a backup of the database and configuration"""
     try:
@@ -91,19 +121,31 @@ def backup_data():
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         backup_file = os.path.join(backup_dir, f"patientcare_backup_{timestamp}.zip")
         
-        # Create a zip file with database and metadata
-        with ZipFile(backup_file, 'w') as zipf:
-            zipf.write(db_path, os.path.basename(db_path))
+        # Take a consistent snapshot with SQLite's online backup API
+        snapshot_file = os.path.join(backup_dir, "backup_snapshot.db")
+        snapshot = sqlite3.connect(snapshot_file)
+        try:
+            conn.backup(snapshot, pages=1024)
             
             # Add metadata about the backup
             metadata = {
                 "backup_date": timestamp,
                 "database_version": "1.0",
                 "records": {
-                    "patients": cursor.execute("SELECT COUNT(*) FROM Patients").fetchone()[0],
-                    "medicines": cursor.execute("SELECT COUNT(*) FROM Medicines").fetchone()[0]
+                    "patients": snapshot.execute("SELECT COUNT(*) FROM Patients").fetchone()[0],
+                    "medicines": snapshot.execute("SELECT COUNT(*) FROM Medicines").fetchone()[0]
                 }
             }
+        finally:
+            snapshot.close()
+        
+        # Create a zip file with database and metadata
+        # SQLite files compress well, level 1 keeps the CPU cost low
+        with ZipFile(backup_file, 'w', compression=ZIP_DEFLATED, compresslevel=1) as zipf:
+            with open(snapshot_file, 'rb') as src, \
+                    zipf.open(os.path.basename(db_path), 'w', force_zip64=True) as dst:
+                shutil.copyfileobj(src, dst, _COPY_BUFFER_SIZE)
+            os.remove(snapshot_file)
             
             # Write metadata to a temporary file
             meta_file = os.path.join(backup_dir, "backup_meta.json")
@@ -120,7 +162,7 @@ def backup_data():
         return True
     except Exception as e:
         messagebox.showerror("Backup Failed", f"Failed to create backup:\n{str(e)}")
-        traceback.print_exc()
+        log.debug("Error details", exc_info=True)
         return False
 
 def restore_data():
@@ -149,7 +191,7 @@ def restore_data():
             return False
             
         # Create temporary restore directory
-        restore_dir = os.path.join(os.path.dirname(get_db_path())), "restore_temp"
+        restore_dir = os.path.join(os.path.dirname(get_db_path()), "restore_temp")
         os.makedirs(restore_dir, exist_ok=True)
         
         try:
@@ -168,16 +210,15 @@ def restore_data():
             with open(meta_file, 'r') as f:
                 metadata = json.load(f)
                 
-            # Close current database connection
-            global conn, cursor
-            conn.close()
-            
-            # Replace current database with backup
-            shutil.copyfile(db_file, get_db_path())
+            # Copy the backup into the live database, the connection stays open
+            source = sqlite3.connect(db_file)
+            try:
+                source.backup(conn, pages=1024)
+            finally:
+                source.close()
             
-            # Reopen database connection
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
+            # Backups taken by older versions may predate the current indexes
+            create_schema(cursor)
             
             messagebox.showinfo("Restore Successful", 
                               f"Database restored successfully from backup:\n{backup_file}\n"
@@ -193,48 +234,103 @@ def restore_data():
                 pass
     except Exception as e:
         messagebox.showerror("Restore Failed", f"Failed to restore backup:\n{str(e)}")
-        traceback.print_exc()
-        
-        # Try to reconnect to original database
-        try:
-            conn = sqlite3.connect(get_db_path())
-            cursor = conn.cursor()
-        except:
-            pass
-            
+        log.debug("Error details", exc_info=True)
         return False
 
 # --- Helper Functions ---
+_MOBILE_RE = re.compile(r'\d{10}')
+
+# Tablets per day for each frequency code, anything else counts as once a day
+_FREQ = {'OD': 1, 'BD': 2, 'TDS': 3, 'QID': 4}
+_VALID_FREQ = frozenset(_FREQ)
+
 def validate_mobile_number(mobile_number):
     if not mobile_number:  # Mobile number is optional
         return True
-    try:
-        return bool(re.match(r'^\d{10}$', mobile_number))
-    except Exception:
-        return False
+    return bool(_MOBILE_RE.fullmatch(mobile_number))
 
 def frequency_to_daily_count(freq):
-    try:
-        return {'OD': 1, 'BD': 2, 'TDS': 3, 'QID': 4}.get(freq.upper(), 1)
-    except Exception:
-        return 1
-
-def calculate_remaining_tablets(start, end, qty, freq):
-    try:
-        daily = frequency_to_daily_count(freq)
-        today = datetime.today().date()
-        try:
-            start = datetime.strptime(start, "%Y-%m-%d").date()
-            end = datetime.strptime(end, "%Y-%m-%d").date()
-        except:
-            return 0
-        if today > end:
-            return 0
-        taken = max((today - start).days, 0) * daily
-        return max(qty - taken, 0)
-    except Exception:
-        return 0
-
+    return _FREQ.get(freq.upper(), 1) if freq else 1
+
+# SQL form of frequency_to_daily_count
+_DAILY_COUNT_SQL = ("CASE UPPER(M.Frequency) "
+                    + " ".join(f"WHEN '{code}' THEN {daily}" for code, daily in _FREQ.items())
+                    + " ELSE 1 END")
+
+# Tablets left today: quantity minus doses since the start date, 0 once the course has ended
+_REMAINING_TABLETS_SQL = f"""
+    CASE
+        WHEN M.MedicineName IS NULL OR M.MedicineName = ''
+             OR julianday(M.StartDate) IS NULL OR julianday(M.EndDate) IS NULL
+             OR julianday('now', 'localtime', 'start of day') > julianday(M.EndDate)
+        THEN 0
+        ELSE MAX(
+            COALESCE(M.Quantity, 0)
+            - MAX(CAST(julianday('now', 'localtime', 'start of day') - julianday(M.StartDate) AS INTEGER), 0)
+              * {_DAILY_COUNT_SQL},
+            0)
+    END
+"""
+
+# Treeview rows: one per (patient, medicine) pair, already in display form
+_PATIENT_ROWS_SQL = f"""
+    SELECT P.PatientID, P.Name, P.Age, P.Gender, P.Address, P.MobileNumber, 
+           COALESCE(M.MedicineName, '') AS MedicineName, COALESCE(M.StartDate, '') AS StartDate,
+           COALESCE(M.Quantity, 0) AS Quantity, COALESCE(M.Frequency, '') AS Frequency,
+           COALESCE(M.EndDate, '') AS EndDate,
+           {_REMAINING_TABLETS_SQL} AS Remaining
+    FROM Patients P
+    LEFT JOIN Medicines M ON P.PatientID = M.PatientID
+"""
+
+_LOAD_ROWS_SQL = _PATIENT_ROWS_SQL + """
+    ORDER BY P.PatientID
+"""
+
+_SEARCH_ROWS_SQL = _PATIENT_ROWS_SQL + """
+    WHERE LOWER(P.Name) LIKE ?
+    ORDER BY P.PatientID
+"""
+
+_PATIENT_DETAIL_SQL = f"""
+    SELECT P.Name, P.Age, P.Gender, P.Address, P.MobileNumber,
+           M.MedicineID, M.MedicineName, M.StartDate, M.Quantity, M.Frequency, M.EndDate,
+           {_REMAINING_TABLETS_SQL} AS Remaining
+    FROM Patients P
+    LEFT JOIN Medicines M ON M.PatientID = P.PatientID
+    WHERE P.PatientID=?
+    ORDER BY M.MedicineID
+"""
+
+_INSERT_PATIENT_SQL = """
+    INSERT INTO Patients (PatientID, Name, Age, Gender, Address, MobileNumber) 
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+_INSERT_MEDICINE_SQL = """
+    INSERT INTO Medicines (PatientID, MedicineName, StartDate, Quantity, Frequency, EndDate)
+    VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+_UPDATE_PATIENT_SQL = """
+    UPDATE Patients 
+    SET Name=?, Age=?, Gender=?, Address=?, MobileNumber=?
+    WHERE PatientID=?
+"""
+
+_UPDATE_MEDICINE_SQL = """
+    UPDATE Medicines
+    SET MedicineName=?, StartDate=?, Quantity=?, Frequency=?, EndDate=?
+    WHERE MedicineID=?
+"""
+
+_DELETE_MEDICINE_SQL = "DELETE FROM Medicines WHERE MedicineID=?"
+
+_DELETE_PATIENT_MEDICINES_SQL = "DELETE FROM Medicines WHERE PatientID=?"
+
+_DELETE_PATIENT_SQL = "DELETE FROM Patients WHERE PatientID=?"
+
+@functools.lru_cache(maxsize=256)
 def calculate_end_date(start_date, qty, freq):
     try:
         daily = frequency_to_daily_count(freq)
@@ -242,7 +338,7 @@ def calculate_end_date(start_date, qty, freq):
             daily = 1
         days_needed = (qty + daily - 1) // daily
         try:
-            start = datetime.strptime(start_date, "%Y-%m-%d").date()
+            start = date.fromisoformat(start_date)
         except Exception:
             return start_date
         end = start + timedelta(days=days_needed - 1)
@@ -253,63 +349,77 @@ def calculate_end_date(start_date, qty, freq):
 def get_next_available_patient_id():
     """Find the first available patient ID in sequence"""
     try:
-        cursor.execute("SELECT PatientID FROM Patients ORDER BY PatientID")
-        existing_ids = {row[0] for row in cursor.fetchall()}
+        cursor.execute("SELECT 1 FROM Patients WHERE PatientID=1")
+        if cursor.fetchone() is None:
+            return 1  # Also covers an empty table
         
-        # Find the first missing ID starting from 1
-        for candidate_id in range(1, max(existing_ids or [0]) + 2):
-            if candidate_id not in existing_ids:
-                return candidate_id
-        return 1  # Fallback if no patients exist
+        # Smallest ID whose successor is free, answered from the primary key index
+        cursor.execute("""
+            SELECT MIN(p.PatientID + 1)
+            FROM Patients p
+            WHERE NOT EXISTS (SELECT 1 FROM Patients q WHERE q.PatientID = p.PatientID + 1)
+        """)
+        return cursor.fetchone()[0]
     except Exception as e:
         messagebox.showerror("Database Error", f"Failed to get next patient ID:\n{str(e)}")
         return None
 
+def get_patient_with_medicines(patient_id):
+    """Fetch a patient and their medicines in one query; returns (None, []) if the patient does not exist"""
+    patient = None
+    meds = []
+    for row in cursor.execute(_PATIENT_DETAIL_SQL, (patient_id,)):
+        if patient is None:
+            patient = row[:5]
+        # A patient without medicines comes back as a single row with NULL medicine columns
+        if row[5] is not None:
+            meds.append(row[5:])
+    return patient, meds
+
 def resequence_patient_ids():
     try:
-        cursor.execute("SELECT PatientID FROM Patients ORDER BY PatientID")
-        ids = [row[0] for row in cursor.fetchall()]
-        if not ids:
-            return
-
-        mapping = {old_id: new_id+1 for new_id, old_id in enumerate(ids)}
-        
         try:
-            cursor.execute("PRAGMA foreign_keys=OFF")
-            conn.commit()
+            cursor.execute("BEGIN")
             
-            # Create temporary table and copy data
-            cursor.execute("CREATE TABLE IF NOT EXISTS Patients_temp AS SELECT * FROM Patients")
-            cursor.execute("DELETE FROM Patients")
+            # IDs are unique and positive, so N rows with MAX N are already 1..N
+            cursor.execute("SELECT COUNT(*) = COALESCE(MAX(PatientID), 0) FROM Patients")
+            if cursor.fetchone()[0]:
+                conn.commit()
+                return
             
-            # Reinsert with new IDs
-            for old_id in ids:
-                cursor.execute("SELECT Name, Age, Gender, Address, MobileNumber FROM Patients_temp WHERE PatientID=?", (old_id,))
-                data = cursor.fetchone()
-                if data:
-                    cursor.execute("""
-                        INSERT INTO Patients (PatientID, Name, Age, Gender, Address, MobileNumber) 
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    """, (mapping[old_id], *data))
+            # Check foreign keys once at COMMIT, when the references line up again
+            cursor.execute("PRAGMA defer_foreign_keys=ON")
             
             # Update medicine references
-            for old_id, new_id in mapping.items():
-                cursor.execute("UPDATE Medicines SET PatientID=? WHERE PatientID=?", (new_id, old_id))
+            cursor.execute("""
+                UPDATE Medicines SET PatientID = m.new_id
+                FROM (
+                    SELECT PatientID AS old_id, ROW_NUMBER() OVER (ORDER BY PatientID) AS new_id
+                    FROM Patients
+                ) AS m
+                WHERE m.old_id = Medicines.PatientID AND m.old_id <> m.new_id
+            """)
             
-            # Clean up
-            cursor.execute("DROP TABLE Patients_temp")
-            conn.commit()
-            cursor.execute("PRAGMA foreign_keys=ON")
+            # Renumber patients 1..N in ID order; park moved rows on negative IDs
+            # first so no new ID collides with an old one mid-statement
+            cursor.execute("""
+                UPDATE Patients SET PatientID = -m.new_id
+                FROM (
+                    SELECT PatientID AS old_id, ROW_NUMBER() OVER (ORDER BY PatientID) AS new_id
+                    FROM Patients
+                ) AS m
+                WHERE m.old_id = Patients.PatientID AND m.old_id <> m.new_id
+            """)
+            cursor.execute("UPDATE Patients SET PatientID = -PatientID WHERE PatientID < 0")
             conn.commit()
             
         except sqlite3.Error as e:
             conn.rollback()
-            cursor.execute("PRAGMA foreign_keys=ON")
             raise e
             
     except Exception as e:
         messagebox.showerror("Database Error", f"Failed to resequence patient IDs:\n{str(e)}")
-        traceback.print_exc()
+        log.debug("Error details", exc_info=True)
 
 # --- Marquee Widget ---
 class Marquee(tk.Canvas):
@@ -318,6 +428,8 @@ class Marquee(tk.Canvas):
             super().__init__(parent, **kwargs)
             self.text = text
             self.text_id = self.create_text(0, -2000, text=self.text, font=("Arial", 16))
+            # Track the right edge ourselves instead of asking Tk for the bbox every tick
+            self._text_right = self.bbox(self.text_id)[2]
             self.pack()
             self.after(100, self.scroll_text)
         except Exception as e:
@@ -326,16 +438,31 @@ class Marquee(tk.Canvas):
 
     def scroll_text(self):
         try:
+            # Idle slowly while the window is minimized or hidden
+            if not self.winfo_viewable():
+                self.after(500, self.scroll_text)
+                return
+            
             self.move(self.text_id, -2, 0)
-            x1, y1, x2, y2 = self.bbox(self.text_id)
-            if x2 < 0:
+            self._text_right -= 2
+            if self._text_right < 0:
                 width = self.winfo_width()
-                self.coords(self.text_id, width, y1)
+                self.coords(self.text_id, width, self.coords(self.text_id)[1])
+                self._text_right = self.bbox(self.text_id)[2]
             self.after(50, self.scroll_text)
         except Exception:
             pass  # Silently fail if widget is destroyed
 
 # --- Main App ---
+_TREE_PAGE_SIZE = 200  # Patient table rows inserted per scroll step
+_RED_TAGS = ("red",)  # 3 or fewer tablets left
+_YELLOW_TAGS = ("yellow",)  # 4-5 tablets left
+
+# Vertical spacing of the patient PDF, in points
+_PDF_LINE_STEP = 20  # 12pt lines: patient info and medicine names
+_PDF_DETAIL_STEP = 15  # 10pt medicine detail lines
+_PDF_MED_GAP = 10  # Extra space after each medicine
+
 class PatientCareApp:
     def __init__(self, root):
         self.root = root
@@ -343,11 +470,17 @@ class PatientCareApp:
             self.root.title("Patient Care Manager")
             self.root.geometry("1150x750")
             self.editing_id = None
+            self._search_after = None  # Pending debounced search job
+            self._last_search = None  # Term currently shown in the table
+            self._rows = []  # Full result behind the patient table
+            self._rows_shown = 0  # How many of self._rows are inserted into the tree
+            self._original_meds = {}  # MedicineID -> stored values of the patient being edited
+            self._executor = ThreadPoolExecutor(max_workers=1)  # Background PDF export
             self.setup_ui()
             self.load()
         except Exception as e:
             messagebox.showerror("Initialization Error", f"Failed to initialize application:\n{str(e)}")
-            traceback.print_exc()
+            log.debug("Error details", exc_info=True)
             self.root.destroy()
 
     def setup_ui(self):
@@ -361,23 +494,28 @@ class PatientCareApp:
 
             # Patient Info Fields
             ttk.Label(p_frame, text="Name:").grid(row=0, column=0, padx=5, sticky="e")
-            self.name = ttk.Entry(p_frame, width=20)
+            self.name_var = tk.StringVar()
+            self.name = ttk.Entry(p_frame, textvariable=self.name_var, width=20)
             self.name.grid(row=0, column=1)
 
             ttk.Label(p_frame, text="Age:").grid(row=0, column=2, padx=5, sticky="e")
-            self.age = ttk.Entry(p_frame, width=5)
+            self.age_var = tk.StringVar()
+            self.age = ttk.Entry(p_frame, textvariable=self.age_var, width=5)
             self.age.grid(row=0, column=3)
 
             ttk.Label(p_frame, text="Gender:").grid(row=0, column=4, padx=5, sticky="e")
-            self.gender = ttk.Combobox(p_frame, values=["Male", "Female", "Other"], width=10)
+            self.gender_var = tk.StringVar()
+            self.gender = ttk.Combobox(p_frame, textvariable=self.gender_var, values=["Male", "Female", "Other"], width=10)
             self.gender.grid(row=0, column=5)
 
             ttk.Label(p_frame, text="Mobile Number:").grid(row=1, column=0, padx=5, sticky="e")
-            self.mobile = ttk.Entry(p_frame, width=15)
+            self.mobile_var = tk.StringVar()
+            self.mobile = ttk.Entry(p_frame, textvariable=self.mobile_var, width=15)
             self.mobile.grid(row=1, column=1)
 
             ttk.Label(p_frame, text="Address:").grid(row=1, column=2, padx=5, sticky="e")
-            self.address = ttk.Entry(p_frame, width=30)
+            self.address_var = tk.StringVar()
+            self.address = ttk.Entry(p_frame, textvariable=self.address_var, width=30)
             self.address.grid(row=1, column=3, columnspan=3, sticky="w")
 
             # Medicine Info Frame
@@ -410,6 +548,7 @@ class PatientCareApp:
             
             ttk.Button(backup_frame, text="Backup Data", command=backup_data).pack(side="left", padx=5)
             ttk.Button(backup_frame, text="Restore Data", command=restore_data).pack(side="left", padx=5)
+            ttk.Button(backup_frame, text="Compact IDs", command=self.compact_ids).pack(side="left", padx=5)
 
             # Marquee Frame
             marquee_frame = ttk.Frame(self.root)
@@ -448,9 +587,9 @@ class PatientCareApp:
             self.tree.pack(side="left", fill="both", expand=True)
 
             # Vertical scrollbar
-            vsb = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
-            vsb.pack(side="right", fill="y")
-            self.tree.configure(yscrollcommand=vsb.set)
+            self.vsb = ttk.Scrollbar(tree_frame, orient="vertical", command=self.tree.yview)
+            self.vsb.pack(side="right", fill="y")
+            self.tree.configure(yscrollcommand=self._on_tree_yscroll)
 
             # Horizontal scrollbar
             hsb = ttk.Scrollbar(self.root, orient="horizontal", command=self.tree.xview)
@@ -466,69 +605,75 @@ class PatientCareApp:
 
         except Exception as e:
             messagebox.showerror("UI Setup Error", f"Failed to setup user interface:\n{str(e)}")
-            traceback.print_exc()
+            log.debug("Error details", exc_info=True)
             raise
 
     def search_patients(self, event=None):
+        # Debounce typing so only the last keystroke within 200 ms runs the query
+        if self._search_after:
+            self.root.after_cancel(self._search_after)
+        self._search_after = self.root.after(200, self._do_search)
+
+    def _do_search(self):
+        self._search_after = None
         search_term = self.search_var.get().strip().lower()
+        if search_term == self._last_search:
+            return
         if not search_term:
             self.load()
+            self._last_search = search_term
             return
             
-        for row in self.tree.get_children():
-            self.tree.delete(row)
-            
-        cursor.execute("""
-            SELECT P.PatientID, P.Name, P.Age, P.Gender, P.Address, P.MobileNumber, 
-                   M.MedicineName, M.StartDate, M.Quantity, M.Frequency, M.EndDate
-            FROM Patients P
-            LEFT JOIN Medicines M ON P.PatientID = M.PatientID
-            WHERE LOWER(P.Name) LIKE ?
-            ORDER BY P.PatientID
-        """, (f"%{search_term}%",))
+        cursor.execute(_SEARCH_ROWS_SQL, (f"%{search_term}%",))
         
         rows = cursor.fetchall()
         self.populate_treeview(rows)
+        self._last_search = search_term
 
     def clear_search(self):
+        if self._search_after:
+            self.root.after_cancel(self._search_after)
+            self._search_after = None
         self.search_var.set("")
         self.load()
 
     def populate_treeview(self, rows):
-        for row in rows:
+        # Replace the table contents; rows are inserted a page at a time as the user scrolls
+        self.tree.delete(*self.tree.get_children())
+        self._rows = rows
+        self._rows_shown = 0
+        self._insert_next_page()
+
+    def _on_tree_yscroll(self, first, last):
+        self.vsb.set(first, last)
+        # Scrolled to the bottom of what is inserted so far
+        if float(last) >= 1.0 and self._rows_shown < len(self._rows):
+            self._insert_next_page()
+
+    def _insert_next_page(self):
+        end = min(self._rows_shown + _TREE_PAGE_SIZE, len(self._rows))
+        insert = self.tree.insert
+        for row in self._rows[self._rows_shown:end]:
             try:
-                patient_id, name, age, gender, address, mobile, medname, start, qty, freq, end = row
-                qty = qty if qty is not None else 0
-                freq = freq if freq else ""
-                end = end if end else ""
-                remaining = calculate_remaining_tablets(start, end, qty, freq) if medname else 0
-                
-                values = (
-                    patient_id, name, age, gender, address, mobile, 
-                    medname or "", start or "", qty, freq, end, remaining
-                )
-
-                # Apply color tags based on remaining tablets
-                tag = ""
-                if remaining <= 3:
-                    tag = "red"
-                elif remaining > 3 and remaining <= 5:
-                    tag = "yellow"
-
-                tags = (tag,) if tag else ()
-                self.tree.insert("", tk.END, values=values, tags=tags)
+                # Rows arrive display-ready from SQL; only the color tag is picked here
+                remaining = row[-1]
+                tags = _RED_TAGS if remaining <= 3 else _YELLOW_TAGS if remaining <= 5 else ()
+                insert("", tk.END, values=row, tags=tags)
                 
             except Exception as e:
                 messagebox.showerror("Load Error", f"Failed to load row {row}:\n{str(e)}")
                 continue
+        self._rows_shown = end
 
     def add_medicine_row(self):
         try:
-            row = len(self.meds) + 1
-            med = {}
+            # Below the last row; rows removed from the middle leave gaps in the grid
+            row = int(self.meds[-1]['name'].grid_info()['row']) + 1 if self.meds else 1
+            med = {'id': None}  # MedicineID once loaded from the database
 
             # Medicine name entry
-            med['name'] = ttk.Entry(self.m_frame, width=20)
+            med['name_var'] = tk.StringVar()
+            med['name'] = ttk.Entry(self.m_frame, textvariable=med['name_var'], width=20)
             med['name'].grid(row=row, column=0)
 
             # Start date picker
@@ -536,11 +681,13 @@ class PatientCareApp:
             med['start'].grid(row=row, column=1)
 
             # Quantity entry
-            med['qty'] = ttk.Entry(self.m_frame, width=5)
+            med['qty_var'] = tk.StringVar()
+            med['qty'] = ttk.Entry(self.m_frame, textvariable=med['qty_var'], width=5)
             med['qty'].grid(row=row, column=2)
 
             # Frequency combobox
-            med['freq'] = ttk.Combobox(self.m_frame, values=["OD", "BD", "TDS", "QID"], width=5)
+            med['freq_var'] = tk.StringVar()
+            med['freq'] = ttk.Combobox(self.m_frame, textvariable=med['freq_var'], values=list(_FREQ), width=5)
             med['freq'].grid(row=row, column=3)
 
             # End date picker (readonly)
@@ -562,7 +709,7 @@ class PatientCareApp:
 
         except Exception as e:
             messagebox.showerror("Add Medicine Error", f"Failed to add medicine row:\n{str(e)}")
-            traceback.print_exc()
+            log.debug("Error details", exc_info=True)
 
     def auto_update_end_date(self, med):
         try:
@@ -571,14 +718,14 @@ class PatientCareApp:
             return
 
         try:
-            qty_text = med['qty'].get()
-            freq = med['freq'].get().strip().upper()
+            qty_text = med['qty_var'].get()
+            freq = med['freq_var'].get().strip().upper()
             
             if not qty_text.isdigit():
                 return
                 
             qty = int(qty_text)
-            if freq not in ["OD", "BD", "TDS", "QID"]:
+            if freq not in _VALID_FREQ:
                 return
                 
             end_date = calculate_end_date(start_date, qty, freq)
@@ -589,7 +736,7 @@ class PatientCareApp:
             
         except Exception as e:
             messagebox.showerror("Auto Update Error", f"Failed to auto-update end date:\n{str(e)}")
-            traceback.print_exc()
+            log.debug("Error details", exc_info=True)
 
     def remove_medicine_row(self, med):
         try:
@@ -601,97 +748,115 @@ class PatientCareApp:
                 self.meds.remove(med)
         except Exception as e:
             messagebox.showerror("Remove Medicine Error", f"Failed to remove medicine row:\n{str(e)}")
-            traceback.print_exc()
+            log.debug("Error details", exc_info=True)
+
+    def _resize_medicine_rows(self, count):
+        """Add or remove rows at the end until there are count; returns how many existing rows were kept"""
+        for med in self.meds[count:]:
+            self.remove_medicine_row(med)
+        reused = len(self.meds)
+        for _ in range(count - reused):
+            self.add_medicine_row()
+        return reused
+
+    def _clear_row(self, med):
+        """Reset a medicine row's widgets in place so it can be reused"""
+        today = date.today()
+        med['id'] = None
+        med['name_var'].set('')
+        med['start'].set_date(today)
+        med['qty_var'].set('')
+        med['freq_var'].set('')
+        med['end'].config(state="normal")
+        med['end'].set_date(today)
+        med['end'].config(state="readonly")
 
     def clear_form(self):
         try:
-            self.name.delete(0, tk.END)
-            self.age.delete(0, tk.END)
-            self.gender.set('')
-            self.address.delete(0, tk.END)
-            self.mobile.delete(0, tk.END)
-            for med in self.meds[:]:
-                self.remove_medicine_row(med)
-            self.add_medicine_row()
+            self.name_var.set('')
+            self.age_var.set('')
+            self.gender_var.set('')
+            self.address_var.set('')
+            self.mobile_var.set('')
+            if self._resize_medicine_rows(1):
+                self._clear_row(self.meds[0])
             self.editing_id = None
+            self._original_meds = {}
         except Exception as e:
             messagebox.showerror("Clear Form Error", f"Failed to clear form:\n{str(e)}")
-            traceback.print_exc()
+            log.debug("Error details", exc_info=True)
+
+    def _read_form(self):
+        """Validate the form, returning (patient values, [(MedicineID, medicine values)]) or (None, None)."""
+        # Gather every problem so the user can fix them all from one dialog
+        errors = []
+        name = self.name_var.get().strip().title()
+        age = self.age_var.get().strip()
+        gender = self.gender_var.get().strip()
+        address = self.address_var.get().strip()
+        mobile = self.mobile_var.get().strip()
+
+        if not name:
+            errors.append("Patient name is required.")
+        if age and not age.isdigit():
+            errors.append("Age must be a number.")
+        if mobile and not validate_mobile_number(mobile):
+            errors.append("Mobile number must be exactly 10 digits or empty.")
+
+        # Rows left without a name are placeholders; read each name once and skip them up front
+        named_rows = [(i, med, mname) for i, med in enumerate(self.meds, 1)
+                      if (mname := med['name_var'].get().strip().title())]
+        if not named_rows:
+            errors.append("At least one medicine must be provided.")
+
+        meds_data = []
+        for i, med, mname in named_rows:
+            try:
+                start = med['start'].get_date().strftime("%Y-%m-%d")
+                qty_text = med['qty_var'].get().strip()
+                freq = med['freq_var'].get().strip().upper()
+                end = med['end'].get_date().strftime("%Y-%m-%d")
+
+                valid = True
+                if not qty_text.isdigit() or int(qty_text) <= 0:
+                    errors.append(f"Medicine {i} ({mname}): Quantity must be a positive integer.")
+                    valid = False
+                if freq not in _VALID_FREQ:
+                    errors.append(f"Medicine {i} ({mname}): Frequency must be one of OD, BD, TDS, QID.")
+                    valid = False
+
+                if valid:
+                    meds_data.append((med['id'], (mname, start, int(qty_text), freq, end)))
+            except Exception as e:
+                errors.append(f"Medicine {i}: Invalid medicine data: {str(e)}")
+
+        if errors:
+            messagebox.showerror("Validation Error", "\n".join(errors))
+            return None, None
+        return (name, int(age) if age else None, gender, address, mobile if mobile else None), meds_data
 
     def save(self):
         try:
-            # Get and validate patient data
-            name = self.name.get().strip().title()
-            age = self.age.get().strip()
-            gender = self.gender.get().strip()
-            address = self.address.get().strip()
-            mobile = self.mobile.get().strip()
-
-            if not name:
-                messagebox.showerror("Validation Error", "Patient name is required.")
-                return
-            if age and not age.isdigit():
-                messagebox.showerror("Validation Error", "Age must be a number.")
-                return
-            if mobile and not validate_mobile_number(mobile):
-                messagebox.showerror("Validation Error", "Mobile number must be exactly 10 digits or empty.")
-                return
-
-            # Collect medicine data
-            meds_data = []
-            for med in self.meds:
-                try:
-                    mname = med['name'].get().strip().title()
-                    if not mname:
-                        continue
-                        
-                    start = med['start'].get_date().strftime("%Y-%m-%d")
-                    qty_text = med['qty'].get().strip()
-                    freq = med['freq'].get().strip().upper()
-                    end = med['end'].get_date().strftime("%Y-%m-%d")
-
-                    if not qty_text.isdigit() or int(qty_text) <= 0:
-                        messagebox.showerror("Validation Error", "Quantity must be a positive integer.")
-                        return
-                    if freq not in ["OD", "BD", "TDS", "QID"]:
-                        messagebox.showerror("Validation Error", "Frequency must be one of OD, BD, TDS, QID.")
-                        return
-
-                    meds_data.append({
-                        "MedicineName": mname,
-                        "StartDate": start,
-                        "Quantity": int(qty_text),
-                        "Frequency": freq,
-                        "EndDate": end
-                    })
-                except Exception as e:
-                    messagebox.showerror("Medicine Error", f"Invalid medicine data:\n{str(e)}")
-                    return
-
-            if not meds_data:
-                messagebox.showerror("Validation Error", "At least one medicine must be provided.")
+            patient_data, meds_data = self._read_form()
+            if patient_data is None:
                 return
 
             # Save to database
             try:
+                # Take the write lock before picking an ID so nothing can claim it first
+                cursor.execute("BEGIN IMMEDIATE")
+                
                 # Get the next available patient ID
                 next_id = get_next_available_patient_id()
                 if next_id is None:
-                    raise Exception("Could not determine next patient ID")
+                    raise sqlite3.Error("Could not determine next patient ID")
                 
                 # Insert with specific ID to fill gaps
-                cursor.execute("""
-                    INSERT INTO Patients (PatientID, Name, Age, Gender, Address, MobileNumber) 
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (next_id, name, int(age) if age else None, gender, address, mobile if mobile else None))
+                cursor.execute(_INSERT_PATIENT_SQL, (next_id, *patient_data))
                 
                 patient_id = next_id  # Use our assigned ID
 
-                for med in meds_data:
-                    cursor.execute("""
-                        INSERT INTO Medicines (PatientID, MedicineName, StartDate, Quantity, Frequency, EndDate)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    """, (patient_id, med["MedicineName"], med["StartDate"], med["Quantity"], med["Frequency"], med["EndDate"]))
+                cursor.executemany(_INSERT_MEDICINE_SQL, ((patient_id, *values) for _, values in meds_data))
                 
                 conn.commit()
                 messagebox.showinfo("Success", "Patient and medicines saved.")
@@ -701,35 +866,27 @@ class PatientCareApp:
             except sqlite3.Error as e:
                 conn.rollback()
                 messagebox.showerror("Database Error", f"Failed to save data:\n{str(e)}")
-                traceback.print_exc()
+                log.debug("Error details", exc_info=True)
                 
         except Exception as e:
             messagebox.showerror("Save Error", f"An unexpected error occurred:\n{str(e)}")
-            traceback.print_exc()
+            log.debug("Error details", exc_info=True)
 
     def load(self):
         try:
-            # Clear existing treeview data
-            for row in self.tree.get_children():
-                self.tree.delete(row)
-
+            self._last_search = None
+            
             # Fetch data from database
-            cursor.execute("""
-                SELECT P.PatientID, P.Name, P.Age, P.Gender, P.Address, P.MobileNumber, 
-                       M.MedicineName, M.StartDate, M.Quantity, M.Frequency, M.EndDate
-                FROM Patients P
-                LEFT JOIN Medicines M ON P.PatientID = M.PatientID
-                ORDER BY P.PatientID
-            """)
+            cursor.execute(_LOAD_ROWS_SQL)
             rows = cursor.fetchall()
             self.populate_treeview(rows)
                     
         except sqlite3.Error as e:
             messagebox.showerror("Database Error", f"Failed to load data:\n{str(e)}")
-            traceback.print_exc()
+            log.debug("Error details", exc_info=True)
         except Exception as e:
             messagebox.showerror("Load Error", f"An unexpected error occurred:\n{str(e)}")
-            traceback.print_exc()
+            log.debug("Error details", exc_info=True)
 
     def select_record(self, event):
         try:
@@ -743,61 +900,41 @@ class PatientCareApp:
                 
             patient_id = values[0]
 
-            # Fetch patient data
-            cursor.execute("""
-                SELECT Name, Age, Gender, Address, MobileNumber 
-                FROM Patients 
-                WHERE PatientID=?
-            """, (patient_id,))
-            p_data = cursor.fetchone()
+            # Fetch patient and medicine data
+            p_data, meds = get_patient_with_medicines(patient_id)
             
             if not p_data:
                 messagebox.showerror("Error", "Patient not found.")
                 return
 
             # Populate patient fields
-            self.name.delete(0, tk.END)
-            self.name.insert(0, p_data[0])
-            
-            self.age.delete(0, tk.END)
-            self.age.insert(0, p_data[1] if p_data[1] is not None else "")
-            
-            self.gender.set(p_data[2] or "")
+            self.name_var.set(p_data[0])
+            self.age_var.set(p_data[1] if p_data[1] is not None else "")
+            self.gender_var.set(p_data[2] or "")
+            self.address_var.set(p_data[3] or "")
+            self.mobile_var.set(p_data[4] or "")
+
+            # Remember what is stored so update() only writes what changed
+            self._original_meds = {med_data[0]: tuple(med_data[1:6]) for med_data in meds}
             
-            self.address.delete(0, tk.END)
-            self.address.insert(0, p_data[3] or "")
-            
-            self.mobile.delete(0, tk.END)
-            self.mobile.insert(0, p_data[4] or "")
-
-            # Clear existing medicine rows
-            for med in self.meds[:]:
-                self.remove_medicine_row(med)
-
-            # Fetch medicine data
-            cursor.execute("""
-                SELECT MedicineName, StartDate, Quantity, Frequency, EndDate 
-                FROM Medicines 
-                WHERE PatientID=?
-            """, (patient_id,))
-            meds = cursor.fetchall()
-            
-            # Add medicine rows and populate them
-            for _ in meds:
-                self.add_medicine_row()
+            # Reuse the existing medicine rows, only adding or removing the difference
+            reused = self._resize_medicine_rows(len(meds))
                 
             for i, med_data in enumerate(meds):
                 try:
-                    name, start, qty, freq, end = med_data
+                    med_id, name, start, qty, freq, end, _ = med_data
                     med = self.meds[i]
+                    if i < reused:
+                        self._clear_row(med)
+                    med['id'] = med_id
                     
-                    med['name'].insert(0, name)
+                    med['name_var'].set(name)
                     
                     if start:
                         med['start'].set_date(start)
                         
-                    med['qty'].insert(0, str(qty))
-                    med['freq'].set(freq)
+                    med['qty_var'].set(str(qty))
+                    med['freq_var'].set(freq)
                     
                     if end:
                         med['end'].config(state="normal")
@@ -812,7 +949,7 @@ class PatientCareApp:
             
         except Exception as e:
             messagebox.showerror("Selection Error", f"Failed to select record:\n{str(e)}")
-            traceback.print_exc()
+            log.debug("Error details", exc_info=True)
 
     def update(self):
         try:
@@ -820,74 +957,29 @@ class PatientCareApp:
                 messagebox.showerror("Error", "No patient selected for update.")
                 return
 
-            # Get and validate patient data
-            name = self.name.get().strip().title()
-            age = self.age.get().strip()
-            gender = self.gender.get().strip()
-            address = self.address.get().strip()
-            mobile = self.mobile.get().strip()
-
-            if not name:
-                messagebox.showerror("Validation Error", "Patient name is required.")
-                return
-            if age and not age.isdigit():
-                messagebox.showerror("Validation Error", "Age must be a number.")
-                return
-            if mobile and not validate_mobile_number(mobile):
-                messagebox.showerror("Validation Error", "Mobile number must be exactly 10 digits or empty.")
-                return
-
-            # Collect medicine data
-            meds_data = []
-            for med in self.meds:
-                try:
-                    mname = med['name'].get().strip().title()
-                    if not mname:
-                        continue
-                        
-                    start = med['start'].get_date().strftime("%Y-%m-%d")
-                    qty_text = med['qty'].get().strip()
-                    freq = med['freq'].get().strip().upper()
-                    end = med['end'].get_date().strftime("%Y-%m-%d")
-
-                    if not qty_text.isdigit() or int(qty_text) <= 0:
-                        messagebox.showerror("Validation Error", "Quantity must be a positive integer.")
-                        return
-                    if freq not in ["OD", "BD", "TDS", "QID"]:
-                        messagebox.showerror("Validation Error", "Frequency must be one of OD, BD, TDS, QID.")
-                        return
-
-                    meds_data.append({
-                        "MedicineName": mname,
-                        "StartDate": start,
-                        "Quantity": int(qty_text),
-                        "Frequency": freq,
-                        "EndDate": end
-                    })
-                except Exception as e:
-                    messagebox.showerror("Medicine Error", f"Invalid medicine data:\n{str(e)}")
-                    return
-
-            if not meds_data:
-                messagebox.showerror("Validation Error", "At least one medicine must be provided.")
+            patient_data, meds_data = self._read_form()
+            if patient_data is None:
                 return
 
             # Update database
             try:
-                cursor.execute("""
-                    UPDATE Patients 
-                    SET Name=?, Age=?, Gender=?, Address=?, MobileNumber=?
-                    WHERE PatientID=?
-                """, (name, int(age) if age else None, gender, address, mobile if mobile else None, self.editing_id))
-
-                # Delete existing medicines and insert new ones
-                cursor.execute("DELETE FROM Medicines WHERE PatientID=?", (self.editing_id,))
+                cursor.execute("BEGIN IMMEDIATE")
+                cursor.execute(_UPDATE_PATIENT_SQL, (*patient_data, self.editing_id))
+
+                # Write only the medicine rows that were removed, changed or added
+                kept_ids = {med_id for med_id, _ in meds_data if med_id is not None}
+                removed = [(med_id,) for med_id in self._original_meds if med_id not in kept_ids]
+                changed = []
+                added = []
+                for med_id, values in meds_data:
+                    if med_id is None:
+                        added.append((self.editing_id, *values))
+                    elif self._original_meds.get(med_id) != values:
+                        changed.append((*values, med_id))
                 
-                for med in meds_data:
-                    cursor.execute("""
-                        INSERT INTO Medicines (PatientID, MedicineName, StartDate, Quantity, Frequency, EndDate)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    """, (self.editing_id, med["MedicineName"], med["StartDate"], med["Quantity"], med["Frequency"], med["EndDate"]))
+                cursor.executemany(_DELETE_MEDICINE_SQL, removed)
+                cursor.executemany(_UPDATE_MEDICINE_SQL, changed)
+                cursor.executemany(_INSERT_MEDICINE_SQL, added)
                 
                 conn.commit()
                 messagebox.showinfo("Success", "Patient and medicines updated.")
@@ -897,11 +989,11 @@ class PatientCareApp:
             except sqlite3.Error as e:
                 conn.rollback()
                 messagebox.showerror("Database Error", f"Failed to update data:\n{str(e)}")
-                traceback.print_exc()
+                log.debug("Error details", exc_info=True)
                 
         except Exception as e:
             messagebox.showerror("Update Error", f"An unexpected error occurred:\n{str(e)}")
-            traceback.print_exc()
+            log.debug("Error details", exc_info=True)
 
     def delete(self):
         try:
@@ -924,23 +1016,41 @@ class PatientCareApp:
                 return
 
             try:
-                cursor.execute("DELETE FROM Medicines WHERE PatientID=?", (patient_id,))
-                cursor.execute("DELETE FROM Patients WHERE PatientID=?", (patient_id,))
+                cursor.execute("BEGIN IMMEDIATE")
+                cursor.execute(_DELETE_PATIENT_MEDICINES_SQL, (patient_id,))
+                cursor.execute(_DELETE_PATIENT_SQL, (patient_id,))
                 conn.commit()
                 
-                # Resequence to maintain sequential IDs
-                resequence_patient_ids()
+                # IDs are left with a gap here; "Compact IDs" renumbers them on demand
                 self.load()
                 messagebox.showinfo("Deleted", "Patient record deleted.")
                 
             except sqlite3.Error as e:
                 conn.rollback()
                 messagebox.showerror("Database Error", f"Failed to delete record:\n{str(e)}")
-                traceback.print_exc()
+                log.debug("Error details", exc_info=True)
                 
         except Exception as e:
             messagebox.showerror("Delete Error", f"An unexpected error occurred:\n{str(e)}")
-            traceback.print_exc()
+            log.debug("Error details", exc_info=True)
+
+    def compact_ids(self):
+        try:
+            if not messagebox.askyesno(
+                "Confirm Compact IDs",
+                "This renumbers all patients as 1, 2, 3, ... in their current order.\n"
+                "Any unsaved changes in the form will be cleared. Continue?"
+            ):
+                return
+            
+            resequence_patient_ids()
+            # The form may refer to an ID that has just changed
+            self.clear_form()
+            self.load()
+            
+        except Exception as e:
+            messagebox.showerror("Compact IDs Error", f"An unexpected error occurred:\n{str(e)}")
+            log.debug("Error details", exc_info=True)
 
     def export_pdf(self):
         try:
@@ -955,26 +1065,13 @@ class PatientCareApp:
                 
             patient_id = values[0]
 
-            # Fetch patient data
-            cursor.execute("""
-                SELECT Name, Age, Gender, Address, MobileNumber 
-                FROM Patients 
-                WHERE PatientID=?
-            """, (patient_id,))
-            p_data = cursor.fetchone()
+            # Fetch patient and medicine data
+            p_data, meds = get_patient_with_medicines(patient_id)
             
             if not p_data:
                 messagebox.showerror("Error", "Patient data not found.")
                 return
 
-            # Fetch medicine data
-            cursor.execute("""
-                SELECT MedicineName, StartDate, Quantity, Frequency, EndDate 
-                FROM Medicines 
-                WHERE PatientID=?
-            """, (patient_id,))
-            meds = cursor.fetchall()
-
             # Ask for save location
             file_path = filedialog.asksaveasfilename(
                 defaultextension=".pdf",
@@ -984,101 +1081,118 @@ class PatientCareApp:
             if not file_path:
                 return
 
-            # Generate PDF
-            try:
-                c = canvas.Canvas(file_path, pagesize=letter)
-                width, height = letter
-                
-                # Patient header
-                c.setFont("Helvetica-Bold", 16)
-                c.drawString(50, height - 50, "Patient Details")
-                
-                # Patient info
-                c.setFont("Helvetica", 12)
-                y = height - 80
-                
-                info_lines = [
-                    f"Patient ID: {patient_id}",
-                    f"Name: {p_data[0]}",
-                    f"Age: {p_data[1] if p_data[1] is not None else 'N/A'}",
-                    f"Gender: {p_data[2] or 'N/A'}",
-                    f"Address: {p_data[3] or 'N/A'}",
-                    f"Mobile Number: {p_data[4] or 'N/A'}"
-                ]
-                
-                for line in info_lines:
-                    c.drawString(50, y, line)
-                    y -= 20
-                
-                y -= 20  # Extra space before medicines
-                
-                # Medicine header
-                c.setFont("Helvetica-Bold", 16)
-                c.drawString(50, y, "Medicines")
-                y -= 30
-                
-                if not meds:
-                    c.setFont("Helvetica", 12)
-                    c.drawString(50, y, "No medicines prescribed.")
-                    y -= 20
-                else:
-                    c.setFont("Helvetica", 12)
-                    for med in meds:
-                        try:
-                            medname, start, qty, freq, end = med
-                            remaining = calculate_remaining_tablets(start, end, qty, freq)
-                            
-                            # Medicine name
-                            c.setFont("Helvetica-Bold", 12)
-                            c.drawString(50, y, medname)
-                            y -= 20
-                            
-                            # Medicine details
-                            c.setFont("Helvetica", 10)
-                            details = [
-                                f"Start Date: {start}",
-                                f"Quantity: {qty} tablets",
-                                f"Frequency: {freq}",
-                                f"End Date: {end}",
-                                f"Remaining Tablets: {remaining}",
-                                "--------------------------------"
-                            ]
-                            
-                            for detail in details:
-                                c.drawString(70, y, detail)
-                                y -= 15
-                                
-                            y -= 10  # Space between medicines
-                            
-                            # Page break if needed
-                            if y < 100:
-                                c.showPage()
-                                y = height - 50
-                                c.setFont("Helvetica", 12)
-                                
-                        except Exception as e:
-                            messagebox.showerror("PDF Error", f"Failed to process medicine:\n{str(e)}")
-                            continue
-                
-                c.save()
-                messagebox.showinfo("Exported", f"Patient data exported to:\n{file_path}")
-                
-            except Exception as e:
-                messagebox.showerror("PDF Error", f"Failed to generate PDF:\n{str(e)}")
-                traceback.print_exc()
+            # Generate the PDF off the Tk thread; dialogs are shown from _on_pdf_done
+            future = self._executor.submit(self._do_export, file_path, p_data, meds, patient_id)
+            future.add_done_callback(lambda f: self.root.after(0, self._on_pdf_done, f, file_path))
                 
         except Exception as e:
             messagebox.showerror("Export Error", f"An unexpected error occurred:\n{str(e)}")
-            traceback.print_exc()
+            log.debug("Error details", exc_info=True)
+
+    def _do_export(self, file_path, p_data, meds, patient_id):
+        """Write the patient PDF; runs on the executor thread, so it must not touch Tk."""
+        errors = []  # Medicines that could not be written
+        c = canvas.Canvas(file_path, pagesize=letter)
+        width, height = letter
+        
+        # Patient header
+        c.setFont("Helvetica-Bold", 16)
+        c.drawString(50, height - 50, "Patient Details")
+        
+        # Patient info
+        y = height - 80
+        
+        info_lines = [
+            f"Patient ID: {patient_id}",
+            f"Name: {p_data[0]}",
+            f"Age: {p_data[1] if p_data[1] is not None else 'N/A'}",
+            f"Gender: {p_data[2] or 'N/A'}",
+            f"Address: {p_data[3] or 'N/A'}",
+            f"Mobile Number: {p_data[4] or 'N/A'}"
+        ]
+        
+        # One text object for the whole block instead of one per line
+        text = c.beginText(50, y)
+        text.setFont("Helvetica", 12, leading=_PDF_LINE_STEP)
+        for line in info_lines:
+            text.textLine(line)
+        c.drawText(text)
+        y = text.getY()
+        
+        y -= 20  # Extra space before medicines
+        
+        # Medicine header
+        c.setFont("Helvetica-Bold", 16)
+        c.drawString(50, y, "Medicines")
+        y -= 30
+        
+        if not meds:
+            c.setFont("Helvetica", 12)
+            c.drawString(50, y, "No medicines prescribed.")
+            y -= _PDF_LINE_STEP
+        else:
+            # Each medicine is one text object carrying its own fonts, so the canvas font is left alone
+            for med in meds:
+                try:
+                    _, medname, start, qty, freq, end, remaining = med
+                    
+                    # Medicine name
+                    text = c.beginText(50, y)
+                    text.setFont("Helvetica-Bold", 12, leading=_PDF_LINE_STEP)
+                    text.textLine(medname)
+                    
+                    # Medicine details, indented under the name
+                    text.moveCursor(20, 0)
+                    text.setFont("Helvetica", 10, leading=_PDF_DETAIL_STEP)
+                    details = [
+                        f"Start Date: {start}",
+                        f"Quantity: {qty} tablets",
+                        f"Frequency: {freq}",
+                        f"End Date: {end}",
+                        f"Remaining Tablets: {remaining}",
+                        "--------------------------------"
+                    ]
+                    
+                    for detail in details:
+                        text.textLine(detail)
+                    c.drawText(text)
+                    y = text.getY()
+                        
+                    y -= _PDF_MED_GAP
+                    
+                    # Page break if needed
+                    if y < 100:
+                        c.showPage()
+                        y = height - 50
+                        
+                except Exception as e:
+                    errors.append(f"{med[1]}: {e}")
+                    continue
+        
+        c.save()
+        return errors
+
+    def _on_pdf_done(self, future, file_path):
+        """Report the outcome of a background PDF export on the Tk thread."""
+        try:
+            errors = future.result()
+            if errors:
+                messagebox.showerror("PDF Error", "Failed to process medicine:\n" + "\n".join(errors))
+            messagebox.showinfo("Exported", f"Patient data exported to:\n{file_path}")
+        except Exception as e:
+            messagebox.showerror("PDF Error", f"Failed to generate PDF:\n{str(e)}")
+            log.debug("Error details", exc_info=True)
 
 if __name__ == "__main__":
+    # Tracebacks behind the error dialogs are only written with PATIENTCARE_DEBUG set
+    logging.basicConfig(level=logging.DEBUG if os.getenv("PATIENTCARE_DEBUG") else logging.WARNING)
     try:
         root = tk.Tk()
         app = PatientCareApp(root)
         root.mainloop()
     except Exception as e:
         messagebox.showerror("Fatal Error", f"Application crashed:\n{str(e)}")
-        traceback.print_exc()
+        log.exception("Application crashed")
     finally:
         try:
             conn.close()